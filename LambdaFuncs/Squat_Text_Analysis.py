@@ -1,23 +1,60 @@
-import boto3
 import json
-from botocore.config import Config
 from APIConfig import KNOWLEDGE_BASE_ID, MODEL_ARN
+from aws_clients import get_client
+from prompt_templates import get_template, register_template, record_usage, slot
 
 MODEL_ID = "us.amazon.nova-micro-v1:0"
 REGION_NAME = "us-east-1"
 
+# System prompt: Professional fitness coach
+COACH_SYSTEM_PROMPT = """You are an elite certified strength and conditioning coach with 20+ years of experience. You hold multiple certifications including CSCS (Certified Strength and Conditioning Specialist), NASM-CPT, and have a deep understanding of biomechanics, exercise physiology, and movement science.
+
+Your expertise includes:
+- Biomechanics and movement analysis
+- Injury prevention and rehabilitation
+- Exercise form and technique
+- Program design and periodization
+- Sports performance optimization
+- Corrective exercise and mobility work
+
+You provide evidence-based, detailed explanations that help users understand not just WHAT to do, but WHY. You break down complex concepts into clear, actionable advice. When answering questions, you:
+1. Explain the underlying biomechanical and physiological principles
+2. Provide specific, actionable guidance
+3. Address common misconceptions
+4. Offer practical examples and cues
+5. Consider safety and injury prevention
+
+Be thorough, professional, and educational in your responses."""
+
+FITNESS_ADVICE_TEMPLATE = "fitness_advice_fallback"
+
+# Request body for Nova model (messages-v1 schema)，每次只拼入用户问题
+# 不设置 cache checkpoint：system prompt 约 180 token，低于 Nova 每个 checkpoint 约 1K token 的最小缓存长度
+register_template(FITNESS_ADVICE_TEMPLATE, 1, {
+    "schemaVersion": "messages-v1",
+    "messages": [{
+        "role": "user",
+        "content": [{"text": slot("message")}]
+    }],
+    "system": [{"text": COACH_SYSTEM_PROMPT}],
+    "inferenceConfig": {
+        "maxTokens": 1500,
+        "topP": 0.9,
+        "topK": 20,
+        "temperature": 0.7
+    },
+})
+
 def generate_fitness_advice_with_rag(message: str) -> str:
     """
     Generate professional fitness advice using RAG with Bedrock Knowledge Bases
     """
-    bedrock_agent = boto3.client(
+    bedrock_agent = get_client(
         'bedrock-agent-runtime',
         region_name=REGION_NAME,
-        config=Config(
-            connect_timeout=300,
-            read_timeout=300,
-            retries={'max_attempts': 3}
-        )
+        connect_timeout=300,
+        read_timeout=300,
+        max_attempts=3
     )
     
     try:
@@ -93,71 +130,27 @@ def generate_fitness_advice_fallback(message: str) -> str:
     """
     Fallback: Direct model call without RAG (当RAG失败时使用)
     """
-    client = boto3.client(
+    client = get_client(
         "bedrock-runtime",
         region_name=REGION_NAME,
-        config=Config(
-            connect_timeout=300,
-            read_timeout=300,
-            retries={'max_attempts': 3}
-        )
+        connect_timeout=300,
+        read_timeout=300,
+        max_attempts=3
     )
     
-    # System prompt: Professional fitness coach
-    system_list = [{
-        "text": """You are an elite certified strength and conditioning coach with 20+ years of experience. You hold multiple certifications including CSCS (Certified Strength and Conditioning Specialist), NASM-CPT, and have a deep understanding of biomechanics, exercise physiology, and movement science.
-
-Your expertise includes:
-- Biomechanics and movement analysis
-- Injury prevention and rehabilitation
-- Exercise form and technique
-- Program design and periodization
-- Sports performance optimization
-- Corrective exercise and mobility work
-
-You provide evidence-based, detailed explanations that help users understand not just WHAT to do, but WHY. You break down complex concepts into clear, actionable advice. When answering questions, you:
-1. Explain the underlying biomechanical and physiological principles
-2. Provide specific, actionable guidance
-3. Address common misconceptions
-4. Offer practical examples and cues
-5. Consider safety and injury prevention
-
-Be thorough, professional, and educational in your responses."""
-    }]
-    
-    # User message
-    message_list = [{
-        "role": "user",
-        "content": [{"text": message}]
-    }]
-    
-    # Inference configuration
-    inf_params = {
-        "maxTokens": 1500,
-        "topP": 0.9,
-        "topK": 20,
-        "temperature": 0.7
-    }
-    
-    # Request body for Nova model (messages-v1 schema)
-    request_body = {
-        "schemaVersion": "messages-v1",
-        "messages": message_list,
-        "system": system_list,
-        "inferenceConfig": inf_params,
-    }
-    
     try:
+        template = get_template(FITNESS_ADVICE_TEMPLATE)
         print(f"📤 Calling Nova model: {MODEL_ID}")
         print(f"📝 User question: {message}")
         
         response = client.invoke_model(
             modelId=MODEL_ID,
-            body=json.dumps(request_body)
+            body=template.render(message=message)
         )
         
         response_body = response["body"].read().decode("utf-8")
         model_response = json.loads(response_body)
+        record_usage(template, model_response)
         
         # Parse Nova model response
         if "output" in model_response:
@@ -0,0 +1,39 @@
+import os
+import threading
+import boto3
+from botocore.config import Config
+
+# 每个 boto3 client 的 HTTP 连接池大小（boto3 默认 10）；网关进程内多个线程会共享同一个 client
+MAX_POOL_CONNECTIONS = int(os.environ.get("AWS_MAX_POOL_CONNECTIONS", "50"))
+
+_clients = {}
+_lock = threading.Lock()
+
+
+def get_client(service_name: str, region_name: str = None, connect_timeout: int = None,
+               read_timeout: int = None, max_attempts: int = None):
+    """
+    获取共享的 boto3 client（按服务名和配置缓存）
+
+    boto3 client 是线程安全的，复用它可以复用 HTTP 连接池，避免每次请求重新建连；
+    在 Lambda 中热启动的调用之间也会复用。未指定的超时/重试参数使用 botocore 默认值。
+    本地运行时可通过 AWS_ENDPOINT_URL / AWS_ENDPOINT_URL_S3 等环境变量指向 S3/Bedrock 替身服务。
+    """
+    key = (service_name, region_name, connect_timeout, read_timeout, max_attempts)
+    client = _clients.get(key)
+    if client is not None:
+        return client
+
+    with _lock:
+        client = _clients.get(key)
+        if client is None:
+            config = {"max_pool_connections": MAX_POOL_CONNECTIONS}
+            if connect_timeout is not None:
+                config["connect_timeout"] = connect_timeout
+            if read_timeout is not None:
+                config["read_timeout"] = read_timeout
+            if max_attempts is not None:
+                config["retries"] = {'max_attempts': max_attempts}
+            client = boto3.client(service_name, region_name=region_name, config=Config(**config))
+            _clients[key] = client
+    return client
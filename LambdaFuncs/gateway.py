@@ -0,0 +1,618 @@
+"""
+自托管的 asyncio HTTP 网关：在一个进程内挂载所有 Lambda handler，替代 API Gateway + Lambda
+
+- 将 HTTP 请求转换为 API Gateway (REST proxy) 的 event 结构，直接调用现有的 lambda_handler
+- 阻塞的 boto3 / Bedrock 调用在有界线程池中执行，超出排队上限时直接返回 503
+- 所有 handler 共享 aws_clients 中的连接池
+- 视频上传流式解析 multipart，边读边写入临时文件，再分片上传到 S3，不在内存中缓存整个请求体
+- /health 和 /metrics 用于健康检查和监控
+
+用法：
+    python gateway.py --port 8080 --workers 4
+
+本地运行时可通过 AWS_ENDPOINT_URL_S3 / AWS_ENDPOINT_URL_BEDROCK_RUNTIME 等环境变量
+把 boto3 指向 S3/Bedrock 替身服务（如 LocalStack、MinIO）。
+"""
+import argparse
+import asyncio
+import base64
+import functools
+import json
+import multiprocessing
+import os
+import signal
+import tempfile
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from types import SimpleNamespace
+from urllib.parse import parse_qsl, urlsplit
+
+import Squat_Text_Analysis
+import lambda_GetPresignedURL
+import novalight_model
+import store_video_toS3
+from prompt_templates import get_usage_stats
+
+MAX_WORKERS = int(os.environ.get("GATEWAY_MAX_WORKERS", "32"))  # 同时执行的阻塞调用数
+MAX_QUEUE = int(os.environ.get("GATEWAY_MAX_QUEUE", "128"))  # 等待线程池的最大请求数
+MAX_JSON_BODY = 1024 * 1024  # 非上传接口的请求体上限：1MB
+READ_CHUNK = 64 * 1024
+UPLOAD_SPOOL_SIZE = 1024 * 1024  # 上传的视频超过 1MB 后写入磁盘临时文件
+HEADER_TIMEOUT = float(os.environ.get("GATEWAY_HEADER_TIMEOUT", "10"))  # 读取请求行和请求头的超时（秒）
+KEEP_ALIVE_TIMEOUT = float(os.environ.get("GATEWAY_KEEP_ALIVE_TIMEOUT", "5"))  # keep-alive 连接空闲超时（秒）
+BODY_TIMEOUT = float(os.environ.get("GATEWAY_BODY_TIMEOUT", "30"))  # 请求体读取/响应写出的超时，每收到一块数据重新计时
+BODY_DEADLINE = float(os.environ.get("GATEWAY_BODY_DEADLINE", "300"))  # 整个请求体必须在此时间内读完（秒）
+MULTIPART_OVERHEAD = 64 * 1024  # 上传请求体中视频以外的部分（boundary、字段头、其他字段）的上限
+MAX_HEADERS = 100  # 请求头字段数上限
+MAX_HEADER_BYTES = 16 * 1024  # 请求行 + 请求头的总大小上限
+SHUTDOWN_TIMEOUT = float(os.environ.get("GATEWAY_SHUTDOWN_TIMEOUT", "30"))  # 停止时等待进行中请求完成的时间（秒）
+
+ADMIN_ROUTES = {"/health", "/metrics"}  # 每个 worker 独立的监控端口只提供这些路由
+
+CORS_HEADERS = {"Content-Type": "application/json", "Access-Control-Allow-Origin": "*"}
+
+
+class HTTPError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+def json_response(status: int, payload: dict) -> dict:
+    """与 lambda_handler 返回值相同结构的响应"""
+    return {"statusCode": status, "headers": dict(CORS_HEADERS), "body": json.dumps(payload, ensure_ascii=False)}
+
+
+class StreamingVideoPart:
+    """
+    增量解析 multipart/form-data，只保留第一个视频文件字段（与 store_video_toS3.parse_multipart 规则一致），
+    数据写入 SpooledTemporaryFile，超过 max_size 立即报错
+    """
+
+    def __init__(self, boundary: str, max_size: int):
+        self.delimiter = b"--" + boundary.encode()
+        self.separator = b"\r\n" + self.delimiter
+        self.max_size = max_size
+        self.buffer = b""
+        self.state = "preamble"
+        self.capturing = False
+        self.size = 0
+        self.file = None
+
+    def feed(self, chunk: bytes):
+        self.buffer += chunk
+        while True:
+            if self.state == "preamble":
+                index = self.buffer.find(self.delimiter)
+                if index == -1:
+                    self.buffer = self.buffer[-len(self.delimiter):]
+                    return
+                self.buffer = self.buffer[index + len(self.delimiter):]
+                self.state = "delimiter"
+            elif self.state == "delimiter":
+                if len(self.buffer) < 2:
+                    return
+                if self.buffer.startswith(b"--"):
+                    self.state = "done"
+                    self.buffer = b""
+                    return
+                self.buffer = self.buffer.lstrip(b" \t")
+                if len(self.buffer) < 2:
+                    return
+                if not self.buffer.startswith(b"\r\n"):
+                    raise ValueError("multipart 格式错误：boundary 后缺少换行")
+                self.buffer = self.buffer[2:]
+                self.state = "headers"
+            elif self.state == "headers":
+                index = self.buffer.find(b"\r\n\r\n")
+                if index == -1:
+                    if len(self.buffer) > 16 * 1024:
+                        raise ValueError("multipart 格式错误：字段头过长")
+                    return
+                headers = self.buffer[:index].decode("utf-8", errors="ignore")
+                self.buffer = self.buffer[index + 4:]
+                # 检查是否是视频文件
+                self.capturing = self.file is None and "filename=" in headers and "video" in headers.lower()
+                if self.capturing:
+                    self.file = tempfile.SpooledTemporaryFile(max_size=UPLOAD_SPOOL_SIZE)
+                self.state = "data"
+            elif self.state == "data":
+                index = self.buffer.find(self.separator)
+                if index == -1:
+                    # 保留可能包含半个 boundary 的尾部
+                    keep = len(self.separator) - 1
+                    if len(self.buffer) > keep:
+                        self._write(self.buffer[:-keep])
+                        self.buffer = self.buffer[-keep:]
+                    return
+                self._write(self.buffer[:index])
+                self.buffer = self.buffer[index + len(self.separator):]
+                self.capturing = False
+                self.state = "delimiter"
+            else:
+                self.buffer = b""
+                return
+
+    def _write(self, data: bytes):
+        if not self.capturing or not data:
+            return
+        self.size += len(data)
+        if self.size > self.max_size:
+            raise ValueError(f"视频文件太大: 超过 {self.max_size} bytes，最大限制: {self.max_size} bytes")
+        self.file.write(data)
+
+    def finish(self):
+        """返回定位到开头的视频文件对象；没有视频字段时返回 None"""
+        if self.file is None or self.size == 0:
+            self.close()
+            return None
+        self.file.seek(0)
+        return self.file
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+
+
+def multipart_boundary(content_type: str):
+    if not content_type or "multipart/form-data" not in content_type:
+        return None
+    for part in content_type.split(";"):
+        part = part.strip()
+        if part.startswith("boundary="):
+            return part.split("=", 1)[1].strip('"')
+    return None
+
+
+class Request:
+    def __init__(self, reader, writer, method: str, target: str, version: str, headers: dict):
+        self.reader = reader
+        self.writer = writer
+        self.method = method
+        self.version = version
+        self.headers = headers
+        url = urlsplit(target)
+        self.path = url.path or "/"
+        self.query = dict(parse_qsl(url.query, keep_blank_values=True))
+        # 没有 Content-Length / Transfer-Encoding 的请求（如 GET /health）没有请求体，可直接复用连接
+        self.body_consumed = ("transfer-encoding" not in headers
+                              and headers.get("content-length", "0").strip() in ("", "0"))
+        # 只有路由真正开始读取请求体时才回复 100 Continue，避免客户端上传注定被拒绝的请求体
+        self.expect_continue = headers.get("expect", "").lower() == "100-continue"
+        self.deadline = None
+
+    @property
+    def keep_alive(self) -> bool:
+        connection = self.headers.get("connection", "").lower()
+        if self.version == "HTTP/1.0":
+            return connection == "keep-alive"
+        return connection != "close"
+
+    async def _read(self, awaitable):
+        """
+        单次读取请求体的超时；慢速客户端每次发送数据都会重新计时，
+        但整个请求体仍需在 BODY_DEADLINE 内读完，不能无限占用连接
+        """
+        remaining = self.deadline - asyncio.get_running_loop().time()
+        try:
+            return await asyncio.wait_for(awaitable, max(0, min(BODY_TIMEOUT, remaining)))
+        except asyncio.TimeoutError:
+            raise HTTPError(408, "Request body read timed out")
+        except ValueError:
+            raise HTTPError(400, "Invalid chunked encoding")
+
+    async def iter_body(self):
+        """逐块读取请求体，支持 Content-Length 和 chunked 编码"""
+        if self.body_consumed:
+            return
+        self.deadline = asyncio.get_running_loop().time() + BODY_DEADLINE
+        if self.expect_continue:
+            self.expect_continue = False
+            self.writer.write(b"HTTP/1.1 100 Continue\r\n\r\n")
+            await self._read(self.writer.drain())
+        if "transfer-encoding" in self.headers:
+            while True:
+                size_line = await self._read(self.reader.readline())
+                try:
+                    size = int(size_line.split(b";")[0].strip(), 16)
+                except ValueError:
+                    raise HTTPError(400, "Invalid chunked encoding")
+                if size == 0:
+                    while (await self._read(self.reader.readline())) not in (b"\r\n", b"\n", b""):
+                        pass
+                    break
+                remaining = size
+                while remaining:
+                    chunk = await self._read(self.reader.read(min(remaining, READ_CHUNK)))
+                    if not chunk:
+                        raise ConnectionResetError("客户端提前断开连接")
+                    remaining -= len(chunk)
+                    yield chunk
+                await self._read(self.reader.readexactly(2))
+        else:
+            try:
+                remaining = int(self.headers.get("content-length", "0"))
+            except ValueError:
+                raise HTTPError(400, "Invalid Content-Length")
+            while remaining > 0:
+                chunk = await self._read(self.reader.read(min(remaining, READ_CHUNK)))
+                if not chunk:
+                    raise ConnectionResetError("客户端提前断开连接")
+                remaining -= len(chunk)
+                yield chunk
+        self.body_consumed = True
+
+    async def read_body(self, limit: int) -> bytes:
+        chunks = []
+        size = 0
+        async for chunk in self.iter_body():
+            size += len(chunk)
+            if size > limit:
+                raise HTTPError(413, f"Request body too large, limit: {limit} bytes")
+            chunks.append(chunk)
+        return b"".join(chunks)
+
+
+class Gateway:
+    def __init__(self, max_workers: int = MAX_WORKERS, max_queue: int = MAX_QUEUE, worker_id: int = 0):
+        self.worker_id = worker_id
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="handler")
+        self.max_workers = max_workers
+        self.max_pending = max_workers + max_queue
+        self.pending = 0
+        self.started_at = time.time()
+        self.writers = {}  # 打开的连接 -> 是否正在处理请求
+        self.tasks = {}  # 打开的连接 -> 处理该连接的 task
+        self.stopping = False
+        self.drained = asyncio.Event()
+        self.route_stats = {}
+        self.routes = {
+            "/health": ({"GET"}, self.health),
+            "/metrics": ({"GET"}, self.metrics),
+            "/text-analysis": ({"POST"}, self.lambda_route(Squat_Text_Analysis.lambda_handler, "Squat_Text_Analysis")),
+            "/video-analysis": ({"POST"}, self.lambda_route(novalight_model.lambda_handler, "novalight_model")),
+            "/presigned-url": ({"GET", "POST"}, self.lambda_route(lambda_GetPresignedURL.lambda_handler, "lambda_GetPresignedURL")),
+            "/upload-video": ({"POST"}, self.upload_video),
+        }
+
+    async def run_blocking(self, func, *args):
+        """在有界线程池中执行阻塞调用；排队已满时返回 503 而不是无限堆积"""
+        if self.pending >= self.max_pending:
+            raise HTTPError(503, "Server is busy, please retry later")
+        self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, func, *args)
+        finally:
+            self.pending -= 1
+
+    def lambda_route(self, handler, function_name: str):
+        async def route(request: Request) -> dict:
+            body = await request.read_body(MAX_JSON_BODY)
+            event = self.build_event(request, body)
+            context = SimpleNamespace(function_name=function_name, aws_request_id=str(uuid.uuid4()))
+            return await self.run_blocking(handler, event, context)
+        return route
+
+    @staticmethod
+    def build_event(request: Request, body: bytes) -> dict:
+        """转换为 API Gateway REST proxy 的 event 结构"""
+        try:
+            event_body, is_base64 = body.decode("utf-8"), False
+        except UnicodeDecodeError:
+            event_body, is_base64 = base64.b64encode(body).decode("ascii"), True
+        return {
+            "resource": request.path,
+            "path": request.path,
+            "httpMethod": request.method,
+            "headers": dict(request.headers),
+            "queryStringParameters": request.query or None,
+            "body": event_body,
+            "isBase64Encoded": is_base64,
+        }
+
+    async def upload_video(self, request: Request) -> dict:
+        """流式版本的 store_video_toS3.lambda_handler：不在内存中缓存整个请求体"""
+        part = None
+        try:
+            boundary = multipart_boundary(request.headers.get("content-type", ""))
+            if not boundary:
+                raise ValueError("无法解析 multipart/form-data，请确保 Content-Type 为 multipart/form-data 并包含视频文件")
+
+            # StreamingVideoPart 只统计视频字段的大小，整个请求体（其他字段、epilogue 等）另外限制
+            limit = store_video_toS3.MAX_VIDEO_SIZE + MULTIPART_OVERHEAD
+            declared = request.headers.get("content-length")
+            if declared and int(declared) > limit:
+                raise HTTPError(413, f"Request body too large, limit: {limit} bytes")
+
+            part = StreamingVideoPart(boundary, store_video_toS3.MAX_VIDEO_SIZE)
+            size = 0
+            async for chunk in request.iter_body():
+                size += len(chunk)
+                if size > limit:
+                    raise HTTPError(413, f"Request body too large, limit: {limit} bytes")
+                part.feed(chunk)
+
+            video_file = part.finish()
+            if video_file is None:
+                raise ValueError("无法解析 multipart/form-data，请确保 Content-Type 为 multipart/form-data 并包含视频文件")
+
+            s3_key = await self.run_blocking(store_video_toS3.upload_video, video_file)
+            return json_response(200, {"s3Key": s3_key, "message": "视频上传成功"})
+        except ValueError as e:
+            print(f"Error: {str(e)}")
+            return json_response(500, {"error": str(e)})
+        finally:
+            if part is not None:
+                part.close()
+
+    async def health(self, request: Request) -> dict:
+        return json_response(200, {"status": "ok"})
+
+    async def metrics(self, request: Request) -> dict:
+        return json_response(200, {
+            # 计数器是单个进程内的；多进程时通过 worker / pid 区分，或直接访问各 worker 的 --metrics-port
+            "worker": self.worker_id,
+            "pid": os.getpid(),
+            "uptime_seconds": round(time.time() - self.started_at, 1),
+            "open_connections": len(self.writers),
+            "executor": {
+                "max_workers": self.max_workers,
+                "max_pending": self.max_pending,
+                "pending": self.pending,
+            },
+            "routes": self.route_stats,
+            "prompt_token_usage": get_usage_stats(),
+        })
+
+    def record(self, path: str, status: int, elapsed: float):
+        stats = self.route_stats.setdefault(path, {"requests": 0, "errors": 0, "total_latency_ms": 0.0})
+        stats["requests"] += 1
+        if status >= 500:
+            stats["errors"] += 1
+        stats["total_latency_ms"] = round(stats["total_latency_ms"] + elapsed * 1000, 1)
+
+    def route_key(self, request: Request) -> str:
+        path = request.path.rstrip("/") or "/"
+        return path if path in self.routes else "unmatched"
+
+    async def dispatch(self, request: Request, admin_only: bool = False) -> dict:
+        key = self.route_key(request)
+        route = self.routes.get(key)
+        if route is None or (admin_only and key not in ADMIN_ROUTES):
+            raise HTTPError(404, f"Route not found: {request.path}")
+        methods, handler = route
+        if request.method not in methods:
+            raise HTTPError(405, f"Method {request.method} not allowed")
+        return await handler(request)
+
+    async def handle_connection(self, reader, writer, admin_only: bool = False):
+        if self.stopping:
+            writer.close()
+            return
+        self.writers[writer] = False
+        self.tasks[writer] = asyncio.current_task()
+        first = True
+        try:
+            while True:
+                request = await self.read_request(reader, writer, first)
+                first = False
+                if request is None:
+                    break
+                self.writers[writer] = True
+
+                started = time.monotonic()
+                try:
+                    response = await self.dispatch(request, admin_only)
+                except HTTPError as e:
+                    response = json_response(e.status, {"error": str(e)})
+                except Exception as e:
+                    print(f"❌ Gateway 错误: {str(e)}")
+                    response = json_response(500, {"error": str(e)})
+                status = response.get("statusCode", 200)
+                self.record(self.route_key(request), status, time.monotonic() - started)
+
+                # 请求体没有读完或正在停止时不复用连接
+                keep_alive = request.keep_alive and request.body_consumed and not self.stopping
+                await self.write_response(writer, response, keep_alive)
+                self.writers[writer] = False
+                # 写响应期间开始 shutdown 时，该连接不会被当作空闲连接关闭，需要在这里退出
+                if not keep_alive or self.stopping:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.TimeoutError):
+            pass
+        except asyncio.CancelledError:
+            # shutdown 超时后强制取消，连接直接关闭
+            pass
+        finally:
+            self.writers.pop(writer, None)
+            self.tasks.pop(writer, None)
+            writer.close()
+            if self.stopping and not self.writers:
+                self.drained.set()
+
+    async def read_request(self, reader, writer, first: bool):
+        """读取请求行和请求头；连接空闲超时或客户端断开时返回 None"""
+        try:
+            # 新连接等待第一个请求用 HEADER_TIMEOUT，keep-alive 连接等待下一个请求用 KEEP_ALIVE_TIMEOUT
+            line = await asyncio.wait_for(reader.readline(), HEADER_TIMEOUT if first else KEEP_ALIVE_TIMEOUT)
+        except asyncio.TimeoutError:
+            return None
+        except ValueError:
+            await self.write_response(writer, json_response(400, {"error": "Malformed request"}), False)
+            return None
+        if not line:
+            return None
+
+        try:
+            method, target, version = line.decode("latin-1").rstrip("\r\n").split(" ", 2)
+            headers = await asyncio.wait_for(self.read_headers(reader, len(line)), HEADER_TIMEOUT)
+            self.check_framing(headers)
+        except asyncio.TimeoutError:
+            await self.write_response(writer, json_response(408, {"error": "Request header read timed out"}), False)
+            return None
+        except ValueError:
+            await self.write_response(writer, json_response(400, {"error": "Malformed request"}), False)
+            return None
+        except HTTPError as e:
+            await self.write_response(writer, json_response(e.status, {"error": str(e)}), False)
+            return None
+
+        return Request(reader, writer, method.upper(), target, version, headers)
+
+    @staticmethod
+    def check_framing(headers: dict):
+        """
+        请求体长度必须只有一种明确的表示方式，否则前面的代理和网关可能对请求边界理解不一致（request smuggling）
+        """
+        transfer_encoding = headers.get("transfer-encoding")
+        content_length = headers.get("content-length")
+        if transfer_encoding is not None:
+            if transfer_encoding.lower() != "chunked":
+                raise HTTPError(400, f"Unsupported Transfer-Encoding: {transfer_encoding}")
+            if content_length is not None:
+                raise HTTPError(400, "Content-Length and Transfer-Encoding must not both be present")
+        elif content_length is not None and not (content_length.isascii() and content_length.isdigit()):
+            raise HTTPError(400, "Invalid Content-Length")
+
+    @staticmethod
+    async def read_headers(reader, size: int) -> dict:
+        headers = {}
+        while True:
+            try:
+                header_line = await reader.readline()
+            except ValueError:
+                # 单行超过 StreamReader 的 limit（MAX_HEADER_BYTES）
+                raise HTTPError(431, "Request header fields too large")
+            if header_line in (b"\r\n", b"\n"):
+                return headers
+            if not header_line:
+                raise ConnectionResetError("客户端提前断开连接")
+            size += len(header_line)
+            if size > MAX_HEADER_BYTES or len(headers) >= MAX_HEADERS:
+                raise HTTPError(431, "Request header fields too large")
+            name, separator, value = header_line.decode("latin-1").partition(":")
+            if not separator:
+                raise HTTPError(400, "Malformed header")
+            name = name.strip().lower()
+            if name in headers and name in ("content-length", "transfer-encoding"):
+                raise HTTPError(400, f"Duplicate {name} header")
+            headers[name] = value.strip()
+
+    @staticmethod
+    async def write_response(writer, response: dict, keep_alive: bool):
+        status = response.get("statusCode", 200)
+        body = response.get("body", "")
+        if response.get("isBase64Encoded"):
+            body = base64.b64decode(body)
+        elif isinstance(body, str):
+            body = body.encode("utf-8")
+
+        try:
+            reason = HTTPStatus(status).phrase
+        except ValueError:
+            reason = ""
+        lines = [f"HTTP/1.1 {status} {reason}"]
+        for name, value in (response.get("headers") or {}).items():
+            lines.append(f"{name}: {value}")
+        lines.append(f"Content-Length: {len(body)}")
+        lines.append(f"Connection: {'keep-alive' if keep_alive else 'close'}")
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body)
+        await asyncio.wait_for(writer.drain(), BODY_TIMEOUT)
+
+    async def start(self, host: str, port: int, reuse_port: bool = False, admin_only: bool = False):
+        # limit 同时限制请求行/单个请求头的长度
+        handler = functools.partial(self.handle_connection, admin_only=admin_only)
+        return await asyncio.start_server(handler, host, port, reuse_port=reuse_port, limit=MAX_HEADER_BYTES)
+
+    async def shutdown(self, *servers, timeout: float = None):
+        """
+        停止接受新连接：空闲的 keep-alive 连接立即关闭，进行中的请求最多等待 timeout 秒
+        （响应以 Connection: close 返回），超时后强制关闭剩余连接
+        """
+        self.stopping = True
+        for server in servers:
+            server.close()
+        for writer, busy in list(self.writers.items()):
+            if not busy:
+                writer.close()
+
+        if self.writers:
+            try:
+                await asyncio.wait_for(self.drained.wait(), SHUTDOWN_TIMEOUT if timeout is None else timeout)
+            except asyncio.TimeoutError:
+                print(f"⚠️ {len(self.writers)} 个请求未在超时内完成，强制关闭连接")
+                tasks = list(self.tasks.values())
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+        for server in servers:
+            try:
+                await asyncio.wait_for(server.wait_closed(), 1)
+            except asyncio.TimeoutError:
+                pass
+        # 不等待仍在执行的阻塞调用（如长时间的 Bedrock 视频分析），排队中的任务直接取消
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    async def serve(self, host: str, port: int, reuse_port: bool = False, metrics_port: int = None):
+        servers = [await self.start(host, port, reuse_port)]
+        print(f"✅ Gateway worker {self.worker_id} (进程 {os.getpid()}) 监听 http://{host}:{port}")
+        if metrics_port is not None:
+            servers.append(await self.start(host, metrics_port, admin_only=True))
+            print(f"✅ Gateway worker {self.worker_id} 监控端口 http://{host}:{metrics_port}/metrics")
+
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop.set)
+
+        await stop.wait()
+        await self.shutdown(*servers)
+        print(f"👋 Gateway worker {self.worker_id} (进程 {os.getpid()}) 已停止")
+
+
+def run_worker(host: str, port: int, reuse_port: bool, worker_id: int = 0, metrics_port: int = None):
+    gateway = Gateway(worker_id=worker_id)
+    asyncio.run(gateway.serve(host, port, reuse_port=reuse_port, metrics_port=metrics_port))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Self-hosted gateway for the AI Squatting Coach handlers")
+    parser.add_argument("--host", default=os.environ.get("GATEWAY_HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("GATEWAY_PORT", "8080")))
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("GATEWAY_PROCESSES", os.cpu_count() or 1)),
+                        help="进程数，默认每个 CPU 核心一个进程（通过 SO_REUSEPORT 共享端口）")
+    parser.add_argument("--metrics-port", type=int, default=os.environ.get("GATEWAY_METRICS_PORT"),
+                        help="worker i 额外在 metrics-port + i 上提供 /health 和 /metrics，便于逐个进程采集指标")
+    args = parser.parse_args()
+    metrics_port = int(args.metrics_port) if args.metrics_port is not None else None
+
+    if args.workers <= 1:
+        run_worker(args.host, args.port, False, 0, metrics_port)
+        return
+
+    # 每个子进程各自创建事件循环、线程池和 boto3 client
+    processes = [
+        multiprocessing.Process(
+            target=run_worker,
+            args=(args.host, args.port, True, worker_id, metrics_port + worker_id if metrics_port is not None else None)
+        )
+        for worker_id in range(args.workers)
+    ]
+    for process in processes:
+        process.start()
+
+    def stop(signum, frame):
+        for process in processes:
+            process.terminate()
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+    for process in processes:
+        process.join()
+
+
+if __name__ == "__main__":
+    main()
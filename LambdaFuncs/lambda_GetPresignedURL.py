@@ -1,17 +1,18 @@
 import json
-import boto3
+import uuid
 from datetime import datetime
 from APIConfig import S3_BUCKET
+from aws_clients import get_client
 
 def lambda_handler(event, context):
     try:
         print("📥 Lambda 函数被调用：生成预签名 URL")
         
-        s3 = boto3.client("s3")
+        s3 = get_client("s3")
         
         # 生成唯一的 S3 key
         timestamp = int(datetime.now().timestamp())
-        s3_key = f"squat_video/{timestamp}.mp4"
+        s3_key = f"squat_video/{timestamp}_{uuid.uuid4().hex}.mp4"
         
         print(f"📤 生成 S3 key: {s3_key}")
         
@@ -1,46 +1,16 @@
 import json
-import boto3
 from datetime import datetime
-from botocore.config import Config
 from APIConfig import S3_BUCKET
+from aws_clients import get_client
+from prompt_templates import CACHE_POINT, get_template, register_template, record_usage, slot
 
 MODEL_ID = "us.amazon.nova-lite-v1:0"
 REGION_NAME = "us-east-1"
 MAX_VIDEO_SIZE = 1024 * 1024 * 1024  # 1GB (Nova 模型 S3 URI 方式的最大限制)
 
-def get_bucket_owner() -> str:
-    """获取 S3 bucket 的所有者账户 ID"""
-    try:
-        # 从 STS 获取当前账户 ID（Lambda 执行角色的账户）
-        sts = boto3.client("sts")
-        account_id = sts.get_caller_identity()["Account"]
-        print(f"✅ 获取到账户 ID: {account_id}")
-        return account_id
-    except Exception as e:
-        print(f"⚠️ 无法获取账户 ID: {str(e)}")
-        # 如果无法获取，返回空字符串（某些情况下可能不需要）
-        return ""
+SYSTEM_PROMPT = """You are an elite certified strength and conditioning coach with 15+ years of experience in biomechanics and movement analysis. Your expertise includes Olympic weightlifting, powerlifting, and corrective exercise. You analyze movement patterns with precision and provide actionable, evidence-based feedback."""
 
-def invoke_nova_video_analysis(s3_key: str) -> str:
-    client = boto3.client(
-        "bedrock-runtime",
-        region_name=REGION_NAME,
-        config=Config(
-            connect_timeout=3600,
-            read_timeout=3600,
-            retries={'max_attempts': 1}
-        )
-    )
-    
-    system_list = [{
-        "text": """You are an elite certified strength and conditioning coach with 15+ years of experience in biomechanics and movement analysis. Your expertise includes Olympic weightlifting, powerlifting, and corrective exercise. You analyze movement patterns with precision and provide actionable, evidence-based feedback."""
-    }]
-    
-    # 构建 S3 URI
-    s3_uri = f"s3://{S3_BUCKET}/{s3_key}"
-    bucket_owner = get_bucket_owner()
-    
-    detailed_prompt = """You are analyzing a squat video using a weighted scoring system. You MUST provide a total score out of 100 points at the very beginning of your response.
+DETAILED_PROMPT = """You are analyzing a squat video using a weighted scoring system. You MUST provide a total score out of 100 points at the very beginning of your response.
 
 **🎯 SCORING SYSTEM (100 POINTS TOTAL):**
 
@@ -179,42 +149,91 @@ Structure your response as a professional assessment report.
 - Be thorough and precise in your knee alignment analysis
 
 Be precise, technical, and professional in your analysis."""
-    
-    message_list = [{
+
+VIDEO_ANALYSIS_TEMPLATE = "squat_video_analysis"
+
+VIDEO_CONTENT = {
+    "video": {
+        "format": "mp4",
+        "source": {
+            "s3Location": {
+                "uri": slot("s3_uri"),
+                "bucketOwner": slot("bucket_owner")
+            }
+        }
+    }
+}
+
+INFERENCE_CONFIG = {"maxTokens": 1500, "topP": 0.9, "topK": 20, "temperature": 0.7}
+
+# v1: 原始请求结构（视频 + 评分说明都在 user message 中），不使用 prompt cache。
+# 在 v2 的模型输出（是否仍以 "🏆 SQUAT SCORE" 开头、评分是否一致）用真实视频验证之前，v1 仍是默认版本
+register_template(VIDEO_ANALYSIS_TEMPLATE, 1, {
+    "schemaVersion": "messages-v1",
+    "messages": [{
         "role": "user",
-        "content": [
-            {
-                "video": {
-                    "format": "mp4",
-                    "source": {
-                        "s3Location": {
-                            "uri": s3_uri,
-                            "bucketOwner": bucket_owner
-                        }
-                    }
-                }
-            },
-            {"text": detailed_prompt}
-        ]
-    }]
-    
-    inf_params = {"maxTokens": 1500, "topP": 0.9, "topK": 20, "temperature": 0.7}
+        "content": [VIDEO_CONTENT, {"text": DETAILED_PROMPT}]
+    }],
+    "system": [{"text": SYSTEM_PROMPT}],
+    "inferenceConfig": INFERENCE_CONFIG,
+}, default=True)
+
+# v2: 评分说明移到 system 中，system 末尾放置 cache checkpoint，构成稳定的可缓存前缀；
+# user message 仍然是视频在前，每次只拼入视频的 S3 位置。
+# 通过环境变量 PROMPT_VERSION_SQUAT_VIDEO_ANALYSIS=2 启用
+register_template(VIDEO_ANALYSIS_TEMPLATE, 2, {
+    "schemaVersion": "messages-v1",
+    "messages": [{
+        "role": "user",
+        "content": [VIDEO_CONTENT, {"text": "Analyze the squat in this video."}]
+    }],
+    "system": [{"text": SYSTEM_PROMPT}, {"text": DETAILED_PROMPT}, CACHE_POINT],
+    "inferenceConfig": INFERENCE_CONFIG,
+})
+
+_bucket_owner = None
+
+def get_bucket_owner() -> str:
+    """获取 S3 bucket 的所有者账户 ID（成功后在进程内缓存）"""
+    global _bucket_owner
+    if _bucket_owner:
+        return _bucket_owner
+    try:
+        # 从 STS 获取当前账户 ID（Lambda 执行角色的账户）
+        sts = get_client("sts")
+        account_id = sts.get_caller_identity()["Account"]
+        print(f"✅ 获取到账户 ID: {account_id}")
+        _bucket_owner = account_id
+        return account_id
+    except Exception as e:
+        print(f"⚠️ 无法获取账户 ID: {str(e)}")
+        # 如果无法获取，返回空字符串（某些情况下可能不需要）
+        return ""
+
+def invoke_nova_video_analysis(s3_key: str) -> str:
+    client = get_client(
+        "bedrock-runtime",
+        region_name=REGION_NAME,
+        connect_timeout=3600,
+        read_timeout=3600,
+        max_attempts=1
+    )
     
-    request_body = {
-        "schemaVersion": "messages-v1",
-        "messages": message_list,
-        "system": system_list,
-        "inferenceConfig": inf_params,
-    }
+    # 构建 S3 URI
+    s3_uri = f"s3://{S3_BUCKET}/{s3_key}"
+    bucket_owner = get_bucket_owner()
     
-    request_json = json.dumps(request_body)
+    # 默认使用 v1，可通过环境变量 PROMPT_VERSION_SQUAT_VIDEO_ANALYSIS 切换版本
+    template = get_template(VIDEO_ANALYSIS_TEMPLATE)
+    request_json = template.render(s3_uri=s3_uri, bucket_owner=bucket_owner)
     request_size_mb = len(request_json) / 1024 / 1024
     print(f"📤 调用 Bedrock Nova 模型（S3 URI 方式），请求大小: {request_size_mb:.2f} MB")
-    print(f"📤 S3 URI: {s3_uri}")
+    print(f"📤 S3 URI: {s3_uri}, prompt 模板: {template.key}")
     
     response = client.invoke_model(modelId=MODEL_ID, body=request_json)
     response_body = response["body"].read().decode("utf-8")
     model_response = json.loads(response_body)
+    record_usage(template, model_response)
     
     if "output" in model_response:
         output = model_response.get("output", {})
@@ -242,7 +261,7 @@ def lambda_handler(event, context):
         print(f"📥 开始处理视频: {s3_key}")
         
         # 检查视频文件大小（通过 S3 head_object，不需要下载整个文件）
-        s3 = boto3.client("s3")
+        s3 = get_client("s3")
         try:
             head_response = s3.head_object(Bucket=S3_BUCKET, Key=s3_key)
             video_size = head_response.get("ContentLength", 0)
@@ -263,7 +282,6 @@ def lambda_handler(event, context):
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         result_key = s3_key.replace("squat_video/", "squat_video_model_output/").replace(".mp4", f"_{timestamp}.json")
         
-        s3 = boto3.client("s3")
         s3.put_object(
             Bucket=S3_BUCKET,
             Key=result_key,
@@ -0,0 +1,135 @@
+import json
+import os
+import re
+import threading
+
+# Nova messages-v1 prompt cache checkpoint：之前的所有内容（system + 前面的 message content）作为可缓存前缀
+CACHE_POINT = {"cachePoint": {"type": "default"}}
+
+_SLOT_MARKER = "\u0000slot:{}\u0000"
+_SLOT_PATTERN = re.compile(r'"\\u0000slot:(\w+)\\u0000"')
+
+_registry = {}
+_defaults = {}
+_usage_stats = {}
+_lock = threading.Lock()
+
+
+def slot(name: str) -> str:
+    """在模板 body 中标记一个需要每次调用时填入的字段"""
+    return _SLOT_MARKER.format(name)
+
+
+class PromptTemplate:
+    """
+    预编译的 Bedrock 请求模板
+
+    静态部分（system prompt、长 prompt、inferenceConfig）只在冷启动时 json.dumps 一次，
+    每次调用只序列化 slot 的值并拼接，保证静态前缀字节完全一致，便于命中 prompt cache。
+    """
+
+    def __init__(self, name: str, version: int, body: dict):
+        self.name = name
+        self.version = version
+        self.key = f"{name}@v{version}"
+
+        compiled = json.dumps(body)
+        pieces = _SLOT_PATTERN.split(compiled)
+        # split 结果：[文本, slot 名, 文本, slot 名, ..., 文本]
+        self._segments = pieces[0::2]
+        self.slots = pieces[1::2]
+        if len(set(self.slots)) != len(self.slots):
+            raise ValueError(f"模板 {self.key} 中存在重复的 slot: {self.slots}")
+
+    def render(self, **values) -> str:
+        """填入 slot 值，返回可直接传给 invoke_model 的 JSON 字符串"""
+        missing = [name for name in self.slots if name not in values]
+        if missing:
+            raise ValueError(f"模板 {self.key} 缺少 slot: {missing}")
+
+        parts = [self._segments[0]]
+        for name, segment in zip(self.slots, self._segments[1:]):
+            parts.append(json.dumps(values[name]))
+            parts.append(segment)
+        return "".join(parts)
+
+
+def register_template(name: str, version: int, body: dict, default: bool = False) -> PromptTemplate:
+    """
+    注册并预编译模板；同名模板可注册多个版本。
+    default=True 的版本作为 get_template 的默认版本，没有指定时默认使用最新版本
+    """
+    template = PromptTemplate(name, version, body)
+    with _lock:
+        versions = _registry.setdefault(name, {})
+        if version in versions:
+            raise ValueError(f"模板 {template.key} 已注册")
+        versions[version] = template
+        if default:
+            _defaults[name] = version
+    return template
+
+
+def get_template(name: str, version: int = None) -> PromptTemplate:
+    """
+    获取模板；未指定 version 时读取环境变量 PROMPT_VERSION_<NAME>（如 PROMPT_VERSION_SQUAT_VIDEO_ANALYSIS），
+    都未指定则使用注册时标记为 default 的版本（没有则为最新版本）。用于灰度新版本 prompt 或快速回退。
+    环境变量的值不是已注册的版本号时忽略并打印警告，不影响请求
+    """
+    versions = _registry.get(name)
+    if not versions:
+        raise KeyError(f"未注册的模板: {name}")
+    if version is None:
+        version = _defaults.get(name, max(versions))
+        env_name = f"PROMPT_VERSION_{name.upper()}"
+        pinned = os.environ.get(env_name, "").strip()
+        if pinned:
+            if pinned.isdigit() and int(pinned) in versions:
+                version = int(pinned)
+            else:
+                print(f"⚠️ {env_name}={pinned!r} 不是已注册的版本 {sorted(versions)}，使用 {name}@v{version}")
+    if version not in versions:
+        raise KeyError(f"未注册的模板版本: {name}@v{version}")
+    return versions[version]
+
+
+def record_usage(template: PromptTemplate, model_response: dict) -> dict:
+    """
+    从 Nova 响应的 usage 字段记录缓存命中情况：
+    - cacheReadInputTokenCount: 命中缓存的输入 token
+    - cacheWriteInputTokenCount: 本次写入缓存的输入 token
+    - inputTokens: 未命中缓存的输入 token
+    """
+    usage = model_response.get("usage") or {}
+    cached = usage.get("cacheReadInputTokenCount", 0) or 0
+    cache_write = usage.get("cacheWriteInputTokenCount", 0) or 0
+    uncached = usage.get("inputTokens", 0) or 0
+    output = usage.get("outputTokens", 0) or 0
+
+    with _lock:
+        stats = _usage_stats.setdefault(template.key, {
+            "requests": 0,
+            "cached_input_tokens": 0,
+            "cache_write_input_tokens": 0,
+            "uncached_input_tokens": 0,
+            "output_tokens": 0,
+        })
+        stats["requests"] += 1
+        stats["cached_input_tokens"] += cached
+        stats["cache_write_input_tokens"] += cache_write
+        stats["uncached_input_tokens"] += uncached
+        stats["output_tokens"] += output
+
+    print(f"📊 {template.key} token 使用: 缓存命中 {cached}, 缓存写入 {cache_write}, 未缓存 {uncached}, 输出 {output}")
+    return {
+        "cached_input_tokens": cached,
+        "cache_write_input_tokens": cache_write,
+        "uncached_input_tokens": uncached,
+        "output_tokens": output,
+    }
+
+
+def get_usage_stats() -> dict:
+    """返回当前进程内各模板的累计 token 使用情况"""
+    with _lock:
+        return {key: dict(stats) for key, stats in _usage_stats.items()}
@@ -1,8 +1,9 @@
 import json
-import boto3
+import uuid
 import base64
 from datetime import datetime
 from APIConfig import S3_BUCKET
+from aws_clients import get_client
 MAX_VIDEO_SIZE = 15 * 1024 * 1024  # 15MB
 
 def parse_multipart(body, content_type):
@@ -45,6 +46,20 @@ def parse_multipart(body, content_type):
     
     return None
 
+def new_video_key() -> str:
+    """生成 S3 key；同一秒内可能有多个用户上传，加上随机后缀避免互相覆盖"""
+    timestamp = int(datetime.now().timestamp())
+    return f"squat_video/{timestamp}_{uuid.uuid4().hex}.mp4"
+
+def upload_video(fileobj) -> str:
+    """
+    网关使用：将磁盘上的视频文件对象上传到 S3（大文件自动分片上传，无需整体读入内存），返回 S3 key
+    """
+    s3_key = new_video_key()
+    s3 = get_client("s3")
+    s3.upload_fileobj(fileobj, S3_BUCKET, s3_key, ExtraArgs={"ContentType": "video/mp4"})
+    return s3_key
+
 def lambda_handler(event, context):
     try:
         content_type = event.get("headers", {}).get("content-type") or event.get("headers", {}).get("Content-Type", "")
@@ -69,11 +84,10 @@ def lambda_handler(event, context):
             raise ValueError(f"视频文件太大: {len(video_data)} bytes，最大限制: {MAX_VIDEO_SIZE} bytes")
         
         # 生成 S3 key
-        timestamp = int(datetime.now().timestamp())
-        s3_key = f"squat_video/{timestamp}.mp4"
+        s3_key = new_video_key()
         
         # 上传到 S3
-        s3 = boto3.client("s3")
+        s3 = get_client("s3")
         s3.put_object(
             Bucket=S3_BUCKET,
             Key=s3_key,
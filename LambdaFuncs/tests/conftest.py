@@ -0,0 +1,15 @@
+import importlib.util
+import os
+import sys
+
+LAMBDA_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, LAMBDA_DIR)
+
+# handler 依赖 APIConfig.py（不在仓库中）；测试时使用 APIConfig.example.py 中的占位配置
+try:
+    import APIConfig  # noqa: F401
+except ImportError:
+    spec = importlib.util.spec_from_file_location("APIConfig", os.path.join(LAMBDA_DIR, "APIConfig.example.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    sys.modules["APIConfig"] = module
@@ -0,0 +1,492 @@
+import asyncio
+import base64
+import json
+import threading
+
+import pytest
+
+import Squat_Text_Analysis
+import gateway
+import novalight_model
+import store_video_toS3
+from gateway import HTTPError, Request, StreamingVideoPart
+
+BOUNDARY = "----SquatBoundary7MA4YWxk"
+
+
+def multipart(*parts, epilogue=b""):
+    """parts: (headers, data) 列表，按 multipart/form-data 格式拼接"""
+    body = b"preamble\r\n"
+    for headers, data in parts:
+        body += f"--{BOUNDARY}\r\n{headers}\r\n\r\n".encode() + data + b"\r\n"
+    return body + f"--{BOUNDARY}--\r\n".encode() + epilogue
+
+
+VIDEO_HEADERS = 'Content-Disposition: form-data; name="video"; filename="squat.mp4"\r\nContent-Type: video/mp4'
+TEXT_HEADERS = 'Content-Disposition: form-data; name="note"'
+# 视频内容中包含不完整/不带 CRLF 前缀的 boundary，不能被当作分隔符
+VIDEO = b"\x00\x01mp4" + f"\r\n--{BOUNDARY[:-3]}".encode() + b"middle" + f"--{BOUNDARY}".encode() + b"\r\n-\r\nend"
+
+
+def parse(body: bytes, chunk_size: int = None, max_size: int = 1024 * 1024):
+    part = StreamingVideoPart(BOUNDARY, max_size)
+    chunk_size = chunk_size or len(body)
+    for i in range(0, len(body), chunk_size):
+        part.feed(body[i:i + chunk_size])
+    video = part.finish()
+    try:
+        return video.read() if video is not None else None
+    finally:
+        part.close()
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 7, len(BOUNDARY) + 3, len(BOUNDARY) + 4, len(BOUNDARY) + 5, 777])
+def test_multipart_chunked_feed(chunk_size):
+    body = multipart((TEXT_HEADERS, b"hello"), (VIDEO_HEADERS, VIDEO))
+
+    assert parse(body, chunk_size) == VIDEO
+
+
+def test_multipart_split_at_every_offset():
+    body = multipart((TEXT_HEADERS, b"hello"), (VIDEO_HEADERS, VIDEO))
+
+    for split in range(1, len(body)):
+        part = StreamingVideoPart(BOUNDARY, 1024)
+        part.feed(body[:split])
+        part.feed(body[split:])
+        assert part.finish().read() == VIDEO, split
+        part.close()
+
+
+def test_multipart_ignores_epilogue_after_final_boundary():
+    epilogue = f"--{BOUNDARY}\r\n{VIDEO_HEADERS}\r\n\r\nnot-a-video\r\n--{BOUNDARY}--\r\n".encode()
+    body = multipart((VIDEO_HEADERS, VIDEO), epilogue=epilogue)
+
+    assert parse(body, 5) == VIDEO
+
+
+def test_multipart_keeps_first_video_field():
+    body = multipart((VIDEO_HEADERS, VIDEO), (VIDEO_HEADERS, b"second"))
+
+    assert parse(body, 3) == VIDEO
+
+
+def test_multipart_size_limit():
+    data = b"x" * 100
+    body = multipart((VIDEO_HEADERS, data))
+
+    assert parse(body, 9, max_size=100) == data
+    with pytest.raises(ValueError):
+        parse(body, 9, max_size=99)
+
+
+@pytest.mark.parametrize("parts", [
+    [(TEXT_HEADERS, b"hello")],
+    [('Content-Disposition: form-data; name="image"; filename="a.png"', b"png")],
+    [(VIDEO_HEADERS, b"")],
+    [],
+])
+def test_multipart_without_video(parts):
+    assert parse(multipart(*parts), 4) is None
+
+
+def test_multipart_boundary_from_content_type():
+    assert gateway.multipart_boundary(f'multipart/form-data; boundary="{BOUNDARY}"') == BOUNDARY
+    assert gateway.multipart_boundary("application/json") is None
+
+
+def body_request(data: bytes, headers: dict, eof: bool = True) -> Request:
+    reader = asyncio.StreamReader()
+    reader.feed_data(data)
+    if eof:
+        reader.feed_eof()
+    return Request(reader, None, "POST", "/upload-video", "HTTP/1.1", headers)
+
+
+async def collect(request: Request) -> bytes:
+    return b"".join([chunk async for chunk in request.iter_body()])
+
+
+def test_iter_body_chunked():
+    data = b"4;ext=1\r\nabcd\r\n3\r\nefg\r\n0\r\nX-Trailer: 1\r\n\r\nNEXT"
+
+    async def run():
+        request = body_request(data, {"transfer-encoding": "chunked"})
+        assert await collect(request) == b"abcdefg"
+        assert request.body_consumed
+        assert await request.reader.read() == b"NEXT"
+
+    asyncio.run(run())
+
+
+def test_iter_body_content_length():
+    async def run():
+        request = body_request(b"hello world", {"content-length": "5"})
+        assert not request.body_consumed
+        assert await collect(request) == b"hello"
+        assert request.body_consumed
+
+    asyncio.run(run())
+
+
+def test_iter_body_invalid_chunk_size():
+    async def run():
+        with pytest.raises(HTTPError) as error:
+            await collect(body_request(b"zz\r\nabc\r\n", {"transfer-encoding": "chunked"}))
+        assert error.value.status == 400
+
+    asyncio.run(run())
+
+
+def test_iter_body_timeout(monkeypatch):
+    monkeypatch.setattr(gateway, "BODY_TIMEOUT", 0.05)
+
+    async def run():
+        with pytest.raises(HTTPError) as error:
+            await collect(body_request(b"abc", {"content-length": "10"}, eof=False))
+        assert error.value.status == 408
+
+    asyncio.run(run())
+
+
+def test_iter_body_deadline(monkeypatch):
+    """每块数据都在 BODY_TIMEOUT 内到达，但整个请求体超过 BODY_DEADLINE 仍返回 408"""
+    monkeypatch.setattr(gateway, "BODY_TIMEOUT", 10)
+    monkeypatch.setattr(gateway, "BODY_DEADLINE", 0.2)
+
+    async def run():
+        request = body_request(b"", {"content-length": "1000"}, eof=False)
+        loop = asyncio.get_running_loop()
+        for i in range(100):
+            loop.call_later(i * 0.01, request.reader.feed_data, b"x")
+        with pytest.raises(HTTPError) as error:
+            await asyncio.wait_for(collect(request), 2)
+        assert error.value.status == 408
+
+    asyncio.run(run())
+
+
+async def connect(server):
+    return await asyncio.open_connection("127.0.0.1", server.sockets[0].getsockname()[1])
+
+
+async def start_gateway(max_workers: int = 2, **kwargs):
+    gw = gateway.Gateway(max_workers=max_workers, max_queue=0)
+    server = await gw.start("127.0.0.1", 0, **kwargs)
+    reader, writer = await connect(server)
+    return gw, server, reader, writer
+
+
+async def read_response(reader):
+    head = await reader.readuntil(b"\r\n\r\n")
+    lines = head.decode().split("\r\n")
+    headers = dict(line.lower().split(": ", 1) for line in lines[1:] if line)
+    body = await reader.readexactly(int(headers.get("content-length", "0")))
+    return int(lines[0].split()[1]), headers, body
+
+
+class StubHandler:
+    """替代 lambda_handler；block=True 时在线程池中阻塞直到 release，模拟长时间的 Bedrock 调用"""
+
+    def __init__(self, block: bool = False):
+        self.block = block
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.calls = []
+
+    def __call__(self, event, context):
+        self.calls.append((event, context))
+        self.started.set()
+        if self.block:
+            self.release.wait(5)
+        return {"statusCode": 200, "headers": dict(gateway.CORS_HEADERS), "body": json.dumps({"message": "ok"})}
+
+
+def post(path: str, body: bytes) -> bytes:
+    return f"POST {path} HTTP/1.1\r\nHost: test\r\nContent-Length: {len(body)}\r\n\r\n".encode() + body
+
+
+def test_build_event_matches_api_gateway_proxy_event():
+    request = Request(None, None, "POST", "/text-analysis?lang=zh&empty=", "HTTP/1.1", {"content-type": "application/json"})
+    body = json.dumps({"message": "深蹲"}, ensure_ascii=False).encode()
+
+    assert gateway.Gateway.build_event(request, body) == {
+        "resource": "/text-analysis",
+        "path": "/text-analysis",
+        "httpMethod": "POST",
+        "headers": {"content-type": "application/json"},
+        "queryStringParameters": {"lang": "zh", "empty": ""},
+        "body": body.decode(),
+        "isBase64Encoded": False,
+    }
+
+    event = gateway.Gateway.build_event(Request(None, None, "GET", "/presigned-url", "HTTP/1.1", {}), b"")
+    assert (event["queryStringParameters"], event["body"], event["isBase64Encoded"]) == (None, "", False)
+
+    # 非 UTF-8 的请求体与 API Gateway 一样以 base64 传给 handler
+    binary = b"\xff\xd8\x00video"
+    event = gateway.Gateway.build_event(request, binary)
+    assert event["isBase64Encoded"] and base64.b64decode(event["body"]) == binary
+
+
+def test_lambda_route_calls_handler(monkeypatch):
+    handler = StubHandler()
+    monkeypatch.setattr(Squat_Text_Analysis, "lambda_handler", handler)
+    body = json.dumps({"message": "膝盖内扣"}).encode()
+
+    async def run():
+        gw, server, reader, writer = await start_gateway()
+        writer.write(post("/text-analysis?lang=zh", body))
+        status, headers, response = await read_response(reader)
+        assert (status, headers["connection"], json.loads(response)) == (200, "keep-alive", {"message": "ok"})
+        await gw.shutdown(server)
+
+    asyncio.run(run())
+    [(event, context)] = handler.calls
+    assert (event["httpMethod"], event["body"], event["queryStringParameters"]) == ("POST", body.decode(), {"lang": "zh"})
+    assert context.function_name == "Squat_Text_Analysis"
+
+
+def test_busy_executor_returns_503(monkeypatch):
+    handler = StubHandler(block=True)
+    monkeypatch.setattr(novalight_model, "lambda_handler", handler)
+
+    async def run():
+        gw, server, reader, writer = await start_gateway(max_workers=1)
+        try:
+            writer.write(post("/video-analysis", b"{}"))
+            assert await asyncio.to_thread(handler.started.wait, 5)
+
+            busy_reader, busy_writer = await connect(server)
+            busy_writer.write(post("/video-analysis", b"{}"))
+            status, headers, _ = await read_response(busy_reader)
+            assert (status, headers["connection"]) == (503, "keep-alive")
+        finally:
+            handler.release.set()
+        status, _, _ = await read_response(reader)
+        assert status == 200
+        await gw.shutdown(server)
+
+    asyncio.run(run())
+    assert len(handler.calls) == 1
+
+
+def test_shutdown_waits_for_in_flight_request(monkeypatch):
+    handler = StubHandler(block=True)
+    monkeypatch.setattr(novalight_model, "lambda_handler", handler)
+
+    async def run():
+        gw, server, reader, writer = await start_gateway()
+        try:
+            writer.write(post("/video-analysis", b"{}"))
+            assert await asyncio.to_thread(handler.started.wait, 5)
+            stopping = asyncio.create_task(gw.shutdown(server, timeout=5))
+            await asyncio.sleep(0.1)
+            assert not stopping.done()
+        finally:
+            handler.release.set()
+        # 进行中的请求正常完成，响应后关闭连接
+        status, headers, _ = await read_response(reader)
+        assert (status, headers["connection"]) == (200, "close")
+        assert await asyncio.wait_for(reader.read(), 1) == b""
+        await asyncio.wait_for(stopping, 1)
+
+    asyncio.run(run())
+
+
+def test_shutdown_timeout_closes_in_flight_connection(monkeypatch):
+    handler = StubHandler(block=True)
+    monkeypatch.setattr(novalight_model, "lambda_handler", handler)
+
+    async def run():
+        gw, server, reader, writer = await start_gateway()
+        try:
+            writer.write(post("/video-analysis", b"{}"))
+            assert await asyncio.to_thread(handler.started.wait, 5)
+            await asyncio.wait_for(gw.shutdown(server, timeout=0.1), 2)
+            assert await asyncio.wait_for(reader.read(), 1) == b""
+        finally:
+            handler.release.set()
+
+    asyncio.run(run())
+
+
+def test_keep_alive_for_requests_without_body():
+    async def run():
+        gw, server, reader, writer = await start_gateway()
+        for _ in range(3):
+            writer.write(b"GET /health HTTP/1.1\r\nHost: test\r\n\r\n")
+            status, headers, body = await read_response(reader)
+            assert (status, headers["connection"], json.loads(body)) == (200, "keep-alive", {"status": "ok"})
+        # 连接仍处于 keep-alive 状态时停止，应立即关闭而不是等到空闲超时
+        await asyncio.wait_for(gw.shutdown(server), 1)
+        assert await reader.read() == b""
+
+    asyncio.run(run())
+
+
+def test_expect_continue_only_when_body_is_read(monkeypatch):
+    uploaded = []
+
+    def fake_upload(fileobj):
+        uploaded.append(fileobj.read())
+        return "squat_video/test.mp4"
+
+    monkeypatch.setattr(store_video_toS3, "upload_video", fake_upload)
+    body = multipart((VIDEO_HEADERS, VIDEO))
+
+    async def run():
+        gw, server, reader, writer = await start_gateway()
+        writer.write(b"POST /nope HTTP/1.1\r\nContent-Length: 5\r\nExpect: 100-continue\r\n\r\n")
+        status, headers, _ = await read_response(reader)
+        assert (status, headers["connection"]) == (404, "close")
+
+        reader, writer = await connect(server)
+        writer.write(
+            b"POST /upload-video HTTP/1.1\r\nExpect: 100-continue\r\nTransfer-Encoding: chunked\r\n"
+            + f"Content-Type: multipart/form-data; boundary={BOUNDARY}\r\n\r\n".encode()
+        )
+        status, _, _ = await read_response(reader)
+        assert status == 100
+        for i in range(0, len(body), 10):
+            chunk = body[i:i + 10]
+            writer.write(b"%x\r\n" % len(chunk) + chunk + b"\r\n")
+        writer.write(b"0\r\n\r\n")
+        status, headers, response = await read_response(reader)
+        assert (status, headers["connection"]) == (200, "keep-alive")
+        assert json.loads(response)["s3Key"] == "squat_video/test.mp4"
+        await gw.shutdown(server)
+
+    asyncio.run(run())
+    assert uploaded == [VIDEO]
+
+
+def test_upload_too_large_closes_connection(monkeypatch):
+    monkeypatch.setattr(store_video_toS3, "MAX_VIDEO_SIZE", 10)
+    body = multipart((VIDEO_HEADERS, b"x" * 11))
+
+    async def run():
+        gw, server, reader, writer = await start_gateway()
+        writer.write(
+            f"POST /upload-video HTTP/1.1\r\nContent-Length: {len(body)}\r\n"
+            f"Content-Type: multipart/form-data; boundary={BOUNDARY}\r\n\r\n".encode() + body
+        )
+        status, headers, response = await read_response(reader)
+        assert (status, headers["connection"]) == (500, "close")
+        assert "视频文件太大" in json.loads(response)["error"]
+        await gw.shutdown(server)
+
+    asyncio.run(run())
+
+
+@pytest.mark.parametrize("parts, epilogue", [
+    ([(TEXT_HEADERS, b"n" * 200), (VIDEO_HEADERS, b"x" * 10)], b""),
+    ([(VIDEO_HEADERS, b"x" * 10)], b"e" * 200),
+], ids=["large-field", "epilogue"])
+def test_upload_counts_every_body_byte(monkeypatch, parts, epilogue):
+    """视频本身没有超限，但其他字段 / epilogue 使整个请求体超过上限：返回 413"""
+    monkeypatch.setattr(store_video_toS3, "MAX_VIDEO_SIZE", 10)
+    monkeypatch.setattr(gateway, "MULTIPART_OVERHEAD", 150)
+    body = multipart(*parts, epilogue=epilogue)
+
+    async def run():
+        gw, server, reader, writer = await start_gateway()
+        writer.write(
+            b"POST /upload-video HTTP/1.1\r\nTransfer-Encoding: chunked\r\n"
+            + f"Content-Type: multipart/form-data; boundary={BOUNDARY}\r\n\r\n".encode()
+            + b"%x\r\n" % len(body) + body + b"\r\n0\r\n\r\n"
+        )
+        status, headers, _ = await read_response(reader)
+        assert (status, headers["connection"]) == (413, "close")
+        await gw.shutdown(server)
+
+    asyncio.run(run())
+
+
+def test_upload_content_length_too_large_rejected_before_continue(monkeypatch):
+    monkeypatch.setattr(store_video_toS3, "MAX_VIDEO_SIZE", 10)
+    monkeypatch.setattr(gateway, "MULTIPART_OVERHEAD", 150)
+
+    async def run():
+        gw, server, reader, writer = await start_gateway()
+        writer.write(
+            b"POST /upload-video HTTP/1.1\r\nContent-Length: 161\r\nExpect: 100-continue\r\n"
+            + f"Content-Type: multipart/form-data; boundary={BOUNDARY}\r\n\r\n".encode()
+        )
+        status, headers, _ = await read_response(reader)
+        assert (status, headers["connection"]) == (413, "close")
+        await gw.shutdown(server)
+
+    asyncio.run(run())
+
+
+@pytest.mark.parametrize("framing", [
+    b"Content-Length: 3\r\nTransfer-Encoding: chunked\r\n",
+    b"Transfer-Encoding: chunked\r\nContent-Length: 3\r\n",
+    b"Transfer-Encoding: gzip, chunked\r\n",
+    b"Transfer-Encoding: chunked, chunked\r\n",
+    b"Transfer-Encoding: identity\r\n",
+    b"Transfer-Encoding: chunked\r\nTransfer-Encoding: chunked\r\n",
+    b"Content-Length: 5\r\nContent-Length: 5\r\n",
+    b"Content-Length: +5\r\n",
+    b"Content-Length: \xb2\r\n",
+])
+def test_ambiguous_body_framing_is_rejected(framing):
+    """同时带 Content-Length 和 chunked 等写法会导致 request smuggling：返回 400 并关闭连接，后续请求不会被处理"""
+    async def run():
+        gw, server, reader, writer = await start_gateway()
+        writer.write(
+            b"POST /text-analysis HTTP/1.1\r\nHost: test\r\n" + framing + b"\r\n0\r\n\r\n"
+            + b"GET /health HTTP/1.1\r\nHost: test\r\n\r\n"
+        )
+        status, headers, _ = await read_response(reader)
+        assert (status, headers["connection"]) == (400, "close")
+        assert await asyncio.wait_for(reader.read(), 1) == b""
+        await gw.shutdown(server)
+
+    asyncio.run(run())
+
+
+@pytest.mark.parametrize("request_bytes, expected", [
+    (b"GET /health HTTP/1.1\r\n" + b"".join(b"X-H%d: 1\r\n" % i for i in range(gateway.MAX_HEADERS + 1)) + b"\r\n", 431),
+    (b"GET /health HTTP/1.1\r\nX-Big: " + b"a" * gateway.MAX_HEADER_BYTES + b"\r\n\r\n", 431),
+    (b"GET /health HTTP/1.1\r\nno-colon\r\n\r\n", 400),
+    (b"GET /health HTTP/1.1\r\nHost: test\r\n", 408),
+])
+def test_header_limits_and_timeout(monkeypatch, request_bytes, expected):
+    monkeypatch.setattr(gateway, "HEADER_TIMEOUT", 0.1)
+
+    async def run():
+        gw, server, reader, writer = await start_gateway()
+        writer.write(request_bytes)
+        status, headers, _ = await read_response(reader)
+        assert (status, headers["connection"]) == (expected, "close")
+        await gw.shutdown(server)
+
+    asyncio.run(run())
+
+
+def test_idle_keep_alive_connection_is_closed(monkeypatch):
+    monkeypatch.setattr(gateway, "KEEP_ALIVE_TIMEOUT", 0.1)
+
+    async def run():
+        gw, server, reader, writer = await start_gateway()
+        writer.write(b"GET /health HTTP/1.1\r\n\r\n")
+        await read_response(reader)
+        assert await asyncio.wait_for(reader.read(), 1) == b""
+        await gw.shutdown(server)
+
+    asyncio.run(run())
+
+
+def test_metrics_port_serves_only_admin_routes():
+    async def run():
+        gw, server, reader, writer = await start_gateway(admin_only=True)
+        writer.write(b"GET /metrics HTTP/1.1\r\n\r\nPOST /text-analysis HTTP/1.1\r\n\r\n")
+        status, _, body = await read_response(reader)
+        assert status == 200 and json.loads(body)["worker"] == 0
+        status, _, _ = await read_response(reader)
+        assert status == 404
+        await gw.shutdown(server)
+
+    asyncio.run(run())
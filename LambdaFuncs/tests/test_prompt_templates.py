@@ -0,0 +1,168 @@
+import json
+import uuid
+
+import pytest
+
+from prompt_templates import CACHE_POINT, PromptTemplate, get_template, register_template, record_usage, slot
+
+TRICKY_VALUES = [
+    "plain question",
+    'knees "caving" in?',
+    "back\\slash and \\u0000slot:message\\u0000",
+    "\u0000slot:message\u0000",
+    "深蹲时膝盖内扣怎么办？🏋️",
+    "line\nbreak\ttab\r",
+    "",
+]
+
+
+def build_body(message, owner):
+    return {
+        "schemaVersion": "messages-v1",
+        "system": [{"text": 'Coach "persona" — 教练 ✅'}, CACHE_POINT],
+        "messages": [{
+            "role": "user",
+            "content": [
+                {"video": {"source": {"s3Location": {"uri": "s3://bucket/key.mp4", "bucketOwner": owner}}}},
+                {"text": message},
+            ],
+        }],
+        "inferenceConfig": {"maxTokens": 1500, "topP": 0.9},
+    }
+
+
+@pytest.mark.parametrize("value", TRICKY_VALUES)
+def test_render_matches_json_dumps(value):
+    template = PromptTemplate("test", 1, build_body(slot("message"), slot("owner")))
+
+    assert template.slots == ["owner", "message"]
+    assert template.render(message=value, owner=value[::-1]) == json.dumps(build_body(value, value[::-1]))
+
+
+def test_render_requires_every_slot():
+    template = PromptTemplate("test", 1, build_body(slot("message"), slot("owner")))
+
+    with pytest.raises(ValueError):
+        template.render(message="hi")
+
+
+def test_duplicate_slot_is_rejected():
+    with pytest.raises(ValueError):
+        PromptTemplate("test", 1, build_body(slot("message"), slot("message")))
+
+
+def test_get_template_returns_latest_or_pinned_version(monkeypatch):
+    name = f"test_{uuid.uuid4().hex}"
+    v1 = register_template(name, 1, {"text": slot("message")})
+    v2 = register_template(name, 2, {"text": slot("message"), "cache": CACHE_POINT})
+
+    assert get_template(name) is v2
+    assert get_template(name, 1) is v1
+
+    monkeypatch.setenv(f"PROMPT_VERSION_{name.upper()}", "1")
+    assert get_template(name) is v1
+
+    with pytest.raises(KeyError):
+        get_template(name, 3)
+    with pytest.raises(ValueError):
+        register_template(name, 2, {})
+
+
+def test_get_template_prefers_default_version(monkeypatch):
+    name = f"test_{uuid.uuid4().hex}"
+    v1 = register_template(name, 1, {"text": slot("message")}, default=True)
+    v2 = register_template(name, 2, {"text": slot("message"), "cache": CACHE_POINT})
+
+    assert get_template(name) is v1
+    monkeypatch.setenv(f"PROMPT_VERSION_{name.upper()}", "2")
+    assert get_template(name) is v2
+
+
+@pytest.mark.parametrize("pinned", ["two", "3", "-1", " "])
+def test_get_template_ignores_invalid_pinned_version(monkeypatch, capsys, pinned):
+    name = f"test_{uuid.uuid4().hex}"
+    v1 = register_template(name, 1, {"text": slot("message")}, default=True)
+    register_template(name, 2, {"text": slot("message")})
+
+    monkeypatch.setenv(f"PROMPT_VERSION_{name.upper()}", pinned)
+    assert get_template(name) is v1
+    if pinned.strip():
+        assert f"PROMPT_VERSION_{name.upper()}" in capsys.readouterr().out
+
+
+def test_video_analysis_defaults_to_original_layout(monkeypatch):
+    import novalight_model  # noqa: F401
+
+    monkeypatch.delenv("PROMPT_VERSION_SQUAT_VIDEO_ANALYSIS", raising=False)
+    assert get_template("squat_video_analysis").version == 1
+
+
+def test_record_usage_splits_cached_and_uncached_tokens():
+    template = register_template(f"test_{uuid.uuid4().hex}", 1, {})
+    usage = record_usage(template, {"usage": {
+        "inputTokens": 12,
+        "cacheReadInputTokenCount": 1800,
+        "cacheWriteInputTokenCount": 0,
+        "outputTokens": 300,
+    }})
+
+    assert usage == {
+        "cached_input_tokens": 1800,
+        "cache_write_input_tokens": 0,
+        "uncached_input_tokens": 12,
+        "output_tokens": 300,
+    }
+
+
+def test_v1_templates_match_original_request_bodies():
+    import Squat_Text_Analysis
+    import novalight_model
+
+    message = '膝盖 "valgus"?'
+    assert get_template("fitness_advice_fallback", 1).render(message=message) == json.dumps({
+        "schemaVersion": "messages-v1",
+        "messages": [{"role": "user", "content": [{"text": message}]}],
+        "system": [{"text": Squat_Text_Analysis.COACH_SYSTEM_PROMPT}],
+        "inferenceConfig": {"maxTokens": 1500, "topP": 0.9, "topK": 20, "temperature": 0.7},
+    })
+
+    s3_uri = "s3://bucket/squat_video/1.mp4"
+    assert get_template("squat_video_analysis", 1).render(s3_uri=s3_uri, bucket_owner="123") == json.dumps({
+        "schemaVersion": "messages-v1",
+        "messages": [{
+            "role": "user",
+            "content": [
+                {"video": {"format": "mp4", "source": {"s3Location": {"uri": s3_uri, "bucketOwner": "123"}}}},
+                {"text": novalight_model.DETAILED_PROMPT},
+            ],
+        }],
+        "system": [{"text": novalight_model.SYSTEM_PROMPT}],
+        "inferenceConfig": {"maxTokens": 1500, "topP": 0.9, "topK": 20, "temperature": 0.7},
+    })
+
+
+def test_v2_video_template_keeps_video_first_and_caches_system_prefix():
+    import novalight_model
+
+    template = get_template("squat_video_analysis", 2)
+    assert template.slots == ["s3_uri", "bucket_owner"]
+
+    first = template.render(s3_uri="s3://bucket/squat_video/1.mp4", bucket_owner="111")
+    second = template.render(s3_uri="s3://bucket/squat_video/2_abc.mp4", bucket_owner="222")
+    body = json.loads(first)
+
+    assert body["system"] == [
+        {"text": novalight_model.SYSTEM_PROMPT},
+        {"text": novalight_model.DETAILED_PROMPT},
+        CACHE_POINT,
+    ]
+    content = body["messages"][0]["content"]
+    assert list(content[0]) == ["video"]
+    assert content[0]["video"]["source"]["s3Location"] == {"uri": "s3://bucket/squat_video/1.mp4", "bucketOwner": "111"}
+    assert [list(item) for item in content[1:]] == [["text"]]
+
+    # 两次调用只有视频位置不同：system（可缓存前缀）逐字节一致
+    other = json.loads(second)
+    other["messages"][0]["content"][0]["video"]["source"]["s3Location"] = content[0]["video"]["source"]["s3Location"]
+    assert other == body
+    assert first[first.index('"system"'):] == second[second.index('"system"'):]
@@ -0,0 +1,36 @@
+import base64
+import json
+
+import store_video_toS3
+
+
+class RecordingS3:
+    def __init__(self):
+        self.calls = []
+
+    def put_object(self, **kwargs):
+        self.calls.append(("put_object", kwargs))
+
+    def upload_fileobj(self, *args, **kwargs):
+        self.calls.append(("upload_fileobj", args, kwargs))
+
+
+def test_lambda_handler_uploads_with_single_put_object(monkeypatch):
+    s3 = RecordingS3()
+    monkeypatch.setattr(store_video_toS3, "get_client", lambda service: s3)
+    video = b"\x00mp4" * (3 * 1024 * 1024)  # 12MB，超过 boto3 默认的 8MB 分片阈值
+    body = (b"--b\r\nContent-Disposition: form-data; name=\"video\"; filename=\"a.mp4\"\r\n\r\n"
+            + video + b"\r\n--b--\r\n")
+
+    response = store_video_toS3.lambda_handler({
+        "headers": {"content-type": "multipart/form-data; boundary=b"},
+        "body": base64.b64encode(body).decode(),
+        "isBase64Encoded": True,
+    }, None)
+
+    assert response["statusCode"] == 200
+    [(method, kwargs)] = s3.calls
+    assert method == "put_object"
+    # parse_multipart 沿用原有的解析逻辑（会保留末尾的 CRLF），这里只检查视频内容
+    assert kwargs["Body"].startswith(video)
+    assert kwargs["Key"] == json.loads(response["body"])["s3Key"]